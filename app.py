@@ -15,20 +15,38 @@ import io
 import re
 import json
 import time
+import hashlib
 import locale
+import importlib.util
 import traceback
 import datetime
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from xml.sax.saxutils import escape as xml_escape
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import streamlit as st
 
-# Optional ML libs (best-effort)
+# Idle OpenMP workers sleep instead of spin-waiting between searches; read when faiss loads libgomp
+os.environ.setdefault("OMP_WAIT_POLICY", "PASSIVE")
+
+# Optional ML libs (best-effort); sentence_transformers (and torch with it) is only imported on first retrieval
 try:
-    from sentence_transformers import SentenceTransformer
+    import numpy as np
     import faiss
-    FAISS_OK = True
+    FAISS_OK = importlib.util.find_spec("sentence_transformers") is not None
 except Exception:
     FAISS_OK = False
 
+if FAISS_OK:
+    try:
+        faiss.omp_set_num_threads(os.cpu_count() or 1)
+    except Exception:
+        pass
+
 # Generative SDK (Gemini) optional
 try:
     import google.generativeai as genai
@@ -36,6 +54,13 @@ try:
 except Exception:
     GENAI_SDK = False
 
+# Script-run context for worker threads (internal Streamlit API; moves between versions)
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+    SCRIPT_CTX_OK = True
+except Exception:
+    SCRIPT_CTX_OK = False
+
 # TTS / speech / translation / PDF libs (optional)
 try:
     from gtts import gTTS
@@ -77,6 +102,34 @@ FONTS_DIR = os.path.join(os.path.dirname(__file__), "fonts") if "__file__" in gl
 DEFAULT_MANDI_CROPS = ["Rice", "Wheat", "Tomato", "Maize", "Cotton"]
 HISTORY_LIMIT = 120
 MAX_PROMPT_LEN = 3000
+TRANSLATE_WORKERS = 8  # concurrent per-line translation calls, shared by all target languages
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+
+
+@st.cache_resource(show_spinner=False)
+def get_session():
+    """Process-wide HTTP session: its keep-alive pool reuses TCP/TLS connections across reruns and sessions.
+    Shared by worker threads: callers never mutate session state (headers/auth/cookies are per request),
+    and urllib3's pool is thread-safe; pool_maxsize covers the sidebar and translation workers."""
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=Retry(total=1, backoff_factor=0.2)))
+    return session
+
+# Control characters stripped by clean_text (keeps \t, \n, \r); str.translate is C-level
+_CTRL_TRANS = dict.fromkeys(list(range(0, 9)) + [11, 12] + list(range(14, 32)))
+
+# Precompiled patterns (hot on every rerun / advice generation)
+_DEG_RE = re.compile(r"\b\d+\s?deg\b", re.IGNORECASE)
+_TEMP_RE = re.compile(r"(-?\d+\.?\d*)\s*°?C")
+_HEADER_LINE = re.compile(r"^(Query|Crop|Soil|Stage):")  # local-advice header; echoes user input, left untranslated
+_LINE_RE = re.compile(r"[^\r\n]+")
+_NUMBERED = re.compile(r"^\d+[\).]")
+_NUM_STRIP = re.compile(r"^\d+\W*\s*")
+# `LABEL: ...` sections of a Gemini response, one pattern per label extract_section looks for
+_SECTION_RES = {
+    lbl: re.compile(rf"{re.escape(lbl)}:(.*?)(?:\n[A-Z]+:|\Z)", re.S | re.I)
+    for lbl in ("ENGLISH", "HINDI", "TAMIL", "EN", "हिन्दी", "தமிழ்")
+}
 
 # locale
 try:
@@ -87,8 +140,9 @@ except Exception:
 # session defaults
 if "ui_lang" not in st.session_state:
     st.session_state.ui_lang = "ta" if "ta" in SYS_LOCALE else ("hi" if "hi" in SYS_LOCALE else "en")
-if "history" not in st.session_state:
-    st.session_state.history = []
+if not isinstance(st.session_state.get("history"), deque):
+    # newest first; appendleft is O(1) and the maxlen evicts the oldest report
+    st.session_state.history = deque(st.session_state.get("history") or [], maxlen=HISTORY_LIMIT)
 if "manual_weather" not in st.session_state:
     st.session_state.manual_weather = {"location": "", "note": ""}
 if "genai_key" not in st.session_state:
@@ -97,14 +151,32 @@ if "genai_key" not in st.session_state:
 # optional FAISS resources (if present)
 FAISS_INDEX_PATH = "faiss_index.bin"
 FAISS_META_PATH = "faiss_meta.json"
+# build_index.py writes models/faiss_index.bin, models/texts.bin and models/texts_offsets.npy; copy them next to app.py.
+# The texts are used when faiss_meta.json is absent (their rows must match the index they were built with).
+FAISS_TEXTS_PATH = "texts.bin"  # UTF-8 bytes of all rows, back to back
+FAISS_TEXT_OFFSETS_PATH = "texts_offsets.npy"  # int64, row i is texts.bin[offsets[i]:offsets[i + 1]]
 EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBED_MODEL_REPO = "sentence-transformers/" + EMBED_MODEL_NAME
+# Queries are short; capping tokens keeps the encoder out of the slow long-sequence regime
+EMBED_MAX_SEQ_LEN = 128
+FAISS_NPROBE = 8
+FAISS_EF_SEARCH = 32
+# int8 (AVX-512 VNNI) export shipped in the model repo; used when the ONNX backend is installed
+EMBED_ONNX_FILE = "onnx/model_qint8_avx512_vnni.onnx"
 
 # ---------------- Helpers ----------------
 
 def clean_text(s):
     if not s:
         return ""
-    return re.sub(r"[\x00-\x08\x0b\x0c\x0e-\x1f]", "", str(s))
+    return str(s).translate(_CTRL_TRANS)
+
+
+@st.cache_data(max_entries=2048, show_spinner=False)
+def translate_cached(lang_code, text):
+    """One translation round-trip, memoized across reruns and sessions (failures raise and are not cached).
+    Advice is built from a small set of template lines, so per-line keys hit often."""
+    return GoogleTranslator(source="auto", target=lang_code).translate(text)
 
 
 def tr_ui(text_en, lang_code):
@@ -113,15 +185,58 @@ def tr_ui(text_en, lang_code):
     if lang_code == "en" or not TRANSLATOR_OK:
         return text_en
     try:
-        return GoogleTranslator(source="auto", target=lang_code).translate(text_en)
+        return translate_cached(lang_code, text_en)
     except Exception:
         return text_en
 
+
+def ctx_executor(max_workers):
+    """ThreadPoolExecutor whose workers carry this script run's context, so st.cache_* calls work in them."""
+    if not SCRIPT_CTX_OK:
+        return ThreadPoolExecutor(max_workers=max_workers)
+    ctx = get_script_run_ctx()
+    return ThreadPoolExecutor(max_workers=max_workers, initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx))
+
+
+class PendingTranslation:
+    """Per-line translation futures for one language; result() reassembles the text."""
+
+    def __init__(self, text_en, lines, idx, futures):
+        self.text_en = text_en
+        self.lines = lines
+        self.idx = idx
+        self.futures = futures
+
+    def result(self):
+        out = list(self.lines)
+        try:
+            for i, fut in zip(self.idx, self.futures):
+                out[i] = fut.result() or self.lines[i]
+        except Exception:
+            # a throttled/failed line: keep the whole section in English rather than mixing languages
+            return self.text_en
+        return "\n".join(out)
+
+
+def translate_async(text_en, langs):
+    """Start translating text_en into each language and return {lang: PendingTranslation}.
+    Lines are translated individually (cached per line, numbered points survive intact) on one bounded
+    pool shared by all languages; blank and header lines are not sent."""
+    langs = [l for l in langs if l != "en"]
+    if not langs or not TRANSLATOR_OK:
+        return {}
+    lines = text_en.splitlines()
+    idx = [i for i, ln in enumerate(lines) if ln.strip() and not _HEADER_LINE.match(ln)]
+    ex = ctx_executor(TRANSLATE_WORKERS)
+    pending = {l: PendingTranslation(text_en, lines, idx, [ex.submit(translate_cached, l, lines[i]) for i in idx]) for l in langs}
+    ex.shutdown(wait=False)
+    return pending
+
 @st.cache_data(ttl=600)
 def get_location_by_ip():
     out = {"city": None, "region": None, "country": None}
     try:
-        r = requests.get("https://ipinfo.io/json", timeout=4)
+        r = get_session().get("https://ipinfo.io/json", timeout=4)
         if r.ok:
             j = r.json()
             out["city"] = j.get("city")
@@ -135,7 +250,7 @@ def get_location_by_ip():
 def get_weather_for(place=""):
     try:
         url = f"https://wttr.in/{place}?format=j1" if place else "https://wttr.in/?format=j1"
-        r = requests.get(url, timeout=6)
+        r = get_session().get(url, timeout=6)
         if r.ok:
             j = r.json()
             curr = j.get("current_condition", [{}])[0]
@@ -151,7 +266,7 @@ def try_get_mandi_rates(crop_name):
     try:
         # Defensive parsing of Agmarknet; endpoint may differ across deployments
         url = f"https://agmarknet.gov.in/api/commodity?commodity={crop_name}"
-        resp = requests.get(url, timeout=6)
+        resp = get_session().get(url, timeout=6)
         if resp.ok:
             try:
                 data = resp.json()
@@ -173,34 +288,186 @@ def try_get_mandi_rates(crop_name):
     return {f"{crop_name} Market A": "₹2,100/qtl", f"{crop_name} Market B": "₹2,200/qtl", "Nearby Market C": "₹2,050/qtl"}
 
 # ---------------- FAISS retrieval (optional) ----------------
-EMBEDDING_MODEL = None
-FAISS_INDEX = None
-FAISS_META = None
+# Model, index and metadata are loaded lazily on first retrieval (cached per process),
+# so sessions that never retrieve don't pay the torch/ONNX import and weight load.
 
-if FAISS_OK:
+def physical_cores():
+    try:
+        import psutil
+        return psutil.cpu_count(logical=False) or os.cpu_count() or 1
+    except Exception:
+        return os.cpu_count() or 1
+
+
+def ort_session_options():
+    """ONNX Runtime session options for the embedding model (None if onnxruntime is missing)."""
+    try:
+        import onnxruntime as ort
+        so = ort.SessionOptions()
+        so.intra_op_num_threads = physical_cores()
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        return so
+    except Exception:
+        return None
+
+
+class OrtEncoder:
+    """Tokenizer + bare ONNX Runtime session + numpy mean pooling.
+    Mirrors SentenceTransformer.encode for the calls this app makes, minus the torch-side post-processing."""
+
+    def __init__(self, tokenizer, session, max_length=EMBED_MAX_SEQ_LEN):
+        self.tokenizer = tokenizer
+        self.session = session
+        self.max_length = max_length
+        self.input_names = {i.name for i in session.get_inputs()}
+
+    def encode(self, sentences, normalize_embeddings=False, **kwargs):
+        enc = self.tokenizer(list(sentences), return_tensors="np", padding=True, truncation=True, max_length=self.max_length)
+        feeds = {k: v.astype(np.int64) for k, v in enc.items() if k in self.input_names}
+        token_emb = self.session.run(None, feeds)[0]
+        mask = enc["attention_mask"][..., None].astype(token_emb.dtype)
+        emb = (token_emb * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if normalize_embeddings:
+            emb /= np.clip(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12, None)
+        return emb
+
+
+def load_ort_encoder():
+    import onnxruntime as ort
+    from huggingface_hub import hf_hub_download
+    from transformers import AutoTokenizer
+    model_path = hf_hub_download(EMBED_MODEL_REPO, EMBED_ONNX_FILE)
+    session = ort.InferenceSession(model_path, sess_options=ort_session_options(), providers=["CPUExecutionProvider"])
+    return OrtEncoder(AutoTokenizer.from_pretrained(EMBED_MODEL_REPO), session)
+
+
+@st.cache_resource(show_spinner=False)
+def get_embedding_model():
+    """Prefer a bare int8 ONNX Runtime session, then the sentence-transformers ONNX backend,
+    then the plain PyTorch model (None if nothing loads)."""
+    if not FAISS_OK:
+        return None
+    try:
+        return load_ort_encoder()
+    except Exception:
+        pass
+    try:
+        from sentence_transformers import SentenceTransformer
+    except Exception:
+        return None
+    try:
+        model_kwargs = {"file_name": EMBED_ONNX_FILE}
+        so = ort_session_options()
+        if so is not None:
+            model_kwargs["session_options"] = so
+        model = SentenceTransformer(EMBED_MODEL_NAME, backend="onnx", model_kwargs=model_kwargs)
+    except Exception:
+        try:
+            model = SentenceTransformer(EMBED_MODEL_NAME)
+        except Exception:
+            return None
+        try:
+            import torch  # already loaded by the PyTorch backend
+            torch.set_num_threads(os.cpu_count() or 1)
+        except Exception:
+            pass
+    model.max_seq_length = EMBED_MAX_SEQ_LEN
+    return model
+
+
+def index_to_gpu(index):
+    """Clone the index onto GPU 0 (fp16 storage) if faiss-gpu and a device exist; cuVS builds use cuVS by default.
+    Returns (index, res): res is the StandardGpuResources the clone lives on (None on CPU) and must be kept
+    alive as long as the index. Search parameters (nprobe) are copied by the cloner; anything unsupported stays on CPU."""
+    try:
+        if not hasattr(faiss, "StandardGpuResources") or faiss.get_num_gpus() < 1:
+            return index, None
+        res = faiss.StandardGpuResources()
+        co = faiss.GpuClonerOptions()
+        co.useFloat16 = True
+        return faiss.index_cpu_to_gpu(res, 0, index, co), res
+    except Exception:
+        return index, None
+
+
+class TextsMeta:
+    """faiss_meta.json-shaped records over the memory-mapped texts.bin; rows are decoded only when hit."""
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        return {"text": self.blob[self.offsets[idx]:self.offsets[idx + 1]].tobytes().decode("utf-8")}
+
+
+@st.cache_resource(show_spinner=False)
+def get_faiss_resources():
+    """Return (index, meta, gpu_res); index/meta are None when the file is missing or unreadable.
+    gpu_res is cached alongside the index so a GPU clone's resources live as long as it does."""
+    index = meta = gpu_res = None
+    if not FAISS_OK:
+        return index, meta, gpu_res
     try:
-        EMBEDDING_MODEL = SentenceTransformer(EMBED_MODEL_NAME)
         if os.path.exists(FAISS_INDEX_PATH):
-            FAISS_INDEX = faiss.read_index(FAISS_INDEX_PATH)
+            try:
+                # mmap: pages come from the shared page cache instead of a private copy per worker
+                index = faiss.read_index(FAISS_INDEX_PATH, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except Exception:
+                index = faiss.read_index(FAISS_INDEX_PATH)  # index type / faiss build without mmap support
+            try:
+                faiss.extract_index_ivf(index).nprobe = FAISS_NPROBE
+            except Exception:
+                pass  # not an IVF index: nothing to tune
+            if hasattr(index, "hnsw"):
+                index.hnsw.efSearch = FAISS_EF_SEARCH
+            index, gpu_res = index_to_gpu(index)
         if os.path.exists(FAISS_META_PATH):
             with open(FAISS_META_PATH, "r", encoding="utf-8") as f:
-                FAISS_META = json.load(f)
+                meta = json.load(f)
+        elif os.path.exists(FAISS_TEXTS_PATH) and os.path.exists(FAISS_TEXT_OFFSETS_PATH):
+            meta = TextsMeta(np.memmap(FAISS_TEXTS_PATH, dtype=np.uint8, mode="r"),
+                             np.load(FAISS_TEXT_OFFSETS_PATH, mmap_mode="r"))
     except Exception:
-        FAISS_OK = False
+        return None, None, None
+    return index, meta, gpu_res
+
+
+def normalize_query(text):
+    return " ".join((text or "").lower().split())
+
+
+@st.cache_data(ttl=3600, max_entries=512, show_spinner=False)
+def _embed_normalized(text):
+    return get_embedding_model().encode([text], normalize_embeddings=True).astype("float32")
+
+
+def embed(text):
+    """Unit-length float32 query embedding of shape (1, d).
+    MiniLM is uncased, so caching on the lowercased/whitespace-collapsed text is lossless."""
+    return _embed_normalized(normalize_query(text))
 
 
 def retrieve_similar_docs(query, top_k=4):
     """If FAISS is available and loaded, return top_k similar texts (strings)."""
-    if not FAISS_OK or FAISS_INDEX is None or EMBEDDING_MODEL is None or not FAISS_META:
+    if not FAISS_OK:
+        return []
+    # same threshold analyze_question_for_correction flags as too short; not worth an encoder pass
+    if len((query or "").split()) < 4:
+        return []
+    index, meta, _ = get_faiss_resources()
+    if index is None or not meta or get_embedding_model() is None:
         return []
     try:
-        q_emb = EMBEDDING_MODEL.encode([query])
-        D, I = FAISS_INDEX.search(q_emb.astype("float32"), top_k)
+        D, I = index.search(embed(query), top_k)
         out = []
         for idx in I[0]:
-            if idx < 0 or idx >= len(FAISS_META):
+            if idx < 0 or idx >= len(meta):
                 continue
-            rec = FAISS_META[idx]
+            rec = meta[idx]
             txt = rec.get("text") or rec.get("question") or rec.get("answer") or ""
             if txt:
                 out.append(txt)
@@ -217,7 +484,7 @@ def analyze_question_for_correction(query):
         corrections.append("No question entered — please specify crop or problem.")
     elif len(q.split()) < 4:
         corrections.append("Question is short — include crop, symptoms or context for better advice.")
-    if re.search(r"\b\d+\s?deg\b", q, re.IGNORECASE):
+    if _DEG_RE.search(q):
         corrections.append("Mention temperature units clearly, e.g., '30°C'.")
     return corrections
 
@@ -229,7 +496,7 @@ def assess_suitability_from_weather_and_stage(note, stage):
     try:
         s = ""
         if note:
-            m = re.search(r"(-?\d+\.?\d*)\s*°?C", note)
+            m = _TEMP_RE.search(note)
             if m:
                 temp = float(m.group(1))
                 if temp >= 40:
@@ -254,14 +521,21 @@ def generate_advice_local_dynamic(query, crop, soil, stage, weather_note, retrie
     This is not static — it composes guidance based on query keywords, stage, and retrieved examples."""
     header = f"Query: {query or 'Not specified'}\nCrop: {crop or 'Not specified'}\nSoil: {soil or 'Not specified'}\nStage: {stage or 'Not specified'}"
     points = []
+    seen = set()  # lowercased keys of added points: O(1) dedup, also catches case-only near-duplicates
+
+    def add(p):
+        k = p.strip().lower()
+        if k and k not in seen and len(points) < 10:
+            seen.add(k)
+            points.append(p)
 
     # incorporate retrievals first (short excerpts)
     if retrieved_texts:
         for txt in retrieved_texts[:3]:
             # pick short sentinel suggestions
-            s = txt.strip().splitlines()[0]
+            s = txt.strip().partition("\n")[0].rstrip("\r")
             if s and len(points) < 3:
-                points.append(s if s.endswith('.') else s + '.')
+                add(s if s.endswith('.') else s + '.')
 
     # analyze query for topics
     q = (query or "").lower()
@@ -291,29 +565,26 @@ def generate_advice_local_dynamic(query, crop, soil, stage, weather_note, retrie
 
     # add requested topical items earlier
     if wants_irrig:
-        points.append("Irrigation: schedule based on crop stage and soil moisture; consider drip for water efficiency.")
+        add("Irrigation: schedule based on crop stage and soil moisture; consider drip for water efficiency.")
     if wants_fert:
-        points.append("Fertilizer: follow soil test recommendations; apply split doses to match crop uptake.")
+        add("Fertilizer: follow soil test recommendations; apply split doses to match crop uptake.")
     if wants_pest:
-        points.append("Pest control: identify the pest, use pheromone/biocontrol, and apply chemicals only if threshold exceeded.")
+        add("Pest control: identify the pest, use pheromone/biocontrol, and apply chemicals only if threshold exceeded.")
 
     # fill remaining from templates, but avoid duplicates
     for t in templates:
         if len(points) >= 10:
             break
-        if t not in points:
-            points.append(t)
-    # If still short, pad with advice derived from retrieved_texts or generic guidance
-    i = 0
-    while len(points) < 10:
-        extra = (retrieved_texts[i] if retrieved_texts and i < len(retrieved_texts) else "Keep observing crop and record notes for next season.")
-        cand = extra.strip().splitlines()[0]
-        if cand and cand not in points:
-            points.append(cand if cand.endswith('.') else cand + '.')
-        i += 1
-        if i > 5:
-            # safety fallback
-            points.append("Check local extension services or agronomists for complex issues.")
+        add(t)
+    # If still short, pad with advice derived from retrieved_texts, then generic guidance
+    firsts = (t.strip().partition("\n")[0].rstrip("\r") for t in (retrieved_texts or [])[:6])
+    candidates = [c if c.endswith('.') else c + '.' for c in firsts if c]
+    candidates += ["Keep observing crop and record notes for next season.",
+                   "Check local extension services or agronomists for complex issues."]
+    for c in candidates:
+        if len(points) >= 10:
+            break
+        add(c)
     # Build final text with numbering
     advice = header + "\n\n" + "\n".join(f"{idx+1}) {p}" for idx, p in enumerate(points[:10]))
 
@@ -327,8 +598,30 @@ def generate_advice_local_dynamic(query, crop, soil, stage, weather_note, retrie
 
 # ---------------- Gemini wrapper (compatibility) — robust & non-blocking ----------------
 
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _genai_client(key_hash, model_name, _api_key):
+    # keyed on a hash so the raw API key is never part of the cache key
+    if _api_key:
+        genai.configure(api_key=_api_key)
+    return genai.GenerativeModel(model_name)
+
+
+def genai_client(api_key, model_name=GEMINI_MODEL):
+    """Configured GenerativeModel, reused across reruns.
+    genai.configure is process-global, so only the most recent key is kept (a new key reconfigures)."""
+    key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()
+    return _genai_client(key_hash, model_name, api_key)
+
+
 def generate_advice_gemini(prompt, api_key=None, model_hint="models/text-bison-001"):
     last_err = None
+    if GENAI_SDK and hasattr(genai, "GenerativeModel"):
+        try:
+            resp = genai_client(api_key).generate_content(prompt, generation_config={"max_output_tokens": 800})
+            return resp.text
+        except Exception as e:
+            last_err = e
+    # legacy PaLM-era SDK / REST paths (model_hint)
     if GENAI_SDK:
         try:
             if api_key:
@@ -370,7 +663,7 @@ def generate_advice_gemini(prompt, api_key=None, model_hint="models/text-bison-0
         url = f"{host}/{model}:generate" if model.startswith("models/") else f"{host}/models/{model}:generate"
         headers = {"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"}
         payload = {"prompt": [{"text": prompt}], "maxOutputTokens": 800}
-        r = requests.post(url, headers=headers, json=payload, timeout=30)
+        r = get_session().post(url, headers=headers, json=payload, timeout=30)
         r.raise_for_status()
         j = r.json()
         if isinstance(j, dict):
@@ -396,13 +689,44 @@ def generate_advice_gemini(prompt, api_key=None, model_hint="models/text-bison-0
     except Exception as e:
         raise RuntimeError("Gemini generation failed: " + str(e)) from (last_err if last_err else None)
 
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_gemini(prompt_hash, model_hint, _prompt, _api_key):
+    """generate_advice_gemini memoized on sha256(prompt + model_hint).
+    Underscore args are excluded from Streamlit's cache key, so the API key is never hashed or stored."""
+    return generate_advice_gemini(_prompt, api_key=_api_key, model_hint=model_hint)
+
+# ---------------- Advice formatting ----------------
+
+def enforce_10_points(section_text):
+    """Enforce exactly 10 numbered points per section (post-process if needed)."""
+    # preallocated; slots not filled from the text keep the padding line
+    lines = ["Check local extension services for specific thresholds and timing."] * 10
+    n = 0
+    # lines are pulled lazily, so long LLM outputs stop being scanned once 10 are collected
+    for m in _LINE_RE.finditer(section_text):
+        ln = m.group().strip()
+        if not ln:
+            continue
+        # remove leading numbering; accept other lines that look like sentences as-is
+        lines[n] = _NUM_STRIP.sub("", ln) if _NUMBERED.match(ln) else ln
+        n += 1
+        if n == 10:
+            break
+    return "\n".join(f"{i}) {ln}" for i, ln in enumerate(lines, start=1))
+
 # ---------------- PDF helpers ----------------
 
+def pdf_markup(text):
+    """Whole section as one ReportLab paragraph: escape markup chars, then turn newlines into <br/>."""
+    return xml_escape(text).replace("\n", "<br/>")
+
+
 def create_trilingual_pdf_bytes(en_text, hi_text, ta_text, metadata=None):
     en_text = clean_text(en_text)
     hi_text = clean_text(hi_text or "")
     ta_text = clean_text(ta_text or "")
-    dt = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    dt = (metadata or {}).get("date") or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     if REPORTLAB_OK:
         try:
             buf = io.BytesIO()
@@ -426,11 +750,11 @@ def create_trilingual_pdf_bytes(en_text, hi_text, ta_text, metadata=None):
                 story.append(Paragraph(f"Location: {clean_text(metadata.get('location'))}", normal))
             story.append(Spacer(1, 8))
             story.append(Paragraph("<b>English</b>", style_en)); story.append(Spacer(1,4))
-            for ln in en_text.splitlines(): story.append(Paragraph(clean_text(ln), style_en))
+            story.append(Paragraph(pdf_markup(en_text), style_en))
             story.append(Spacer(1,8)); story.append(Paragraph("<b>हिन्दी</b>", style_hi)); story.append(Spacer(1,4))
-            for ln in hi_text.splitlines(): story.append(Paragraph(clean_text(ln), style_hi))
+            story.append(Paragraph(pdf_markup(hi_text), style_hi))
             story.append(Spacer(1,8)); story.append(Paragraph("<b>தமிழ்</b>", style_ta)); story.append(Spacer(1,4))
-            for ln in ta_text.splitlines(): story.append(Paragraph(clean_text(ln), style_ta))
+            story.append(Paragraph(pdf_markup(ta_text), style_ta))
             doc.build(story)
             buf.seek(0)
             return buf.read()
@@ -469,13 +793,28 @@ def create_trilingual_pdf_bytes(en_text, hi_text, ta_text, metadata=None):
             traceback.print_exc()
     return None
 
+@st.cache_data(max_entries=32, show_spinner=False)
+def pdf_bytes_cached(en_text, hi_text, ta_text, location, date_str):
+    """create_trilingual_pdf_bytes memoized on its (hashable) inputs; date_str is part of the key, so the
+    printed date always matches the caller's timestamp. Raises on failure so a failed build is never cached."""
+    out = create_trilingual_pdf_bytes(en_text, hi_text, ta_text, metadata={"location": location, "date": date_str})
+    if out is None:
+        raise RuntimeError("PDF generation failed")
+    return out
+
 # ---------------- TTS helper ----------------
 
+@st.cache_data(max_entries=64, show_spinner=False)
+def tts_bytes_cached(text, lang_code):
+    """gTTS MP3 per (text, lang); raises on failure so errors are never cached."""
+    buf = io.BytesIO(); gTTS(text=text, lang=lang_code).write_to_fp(buf); return buf.getvalue()
+
+
 def make_tts_bytes_safe(text, lang_code="en"):
     if not GTTS_OK:
         return None
     try:
-        buf = io.BytesIO(); gTTS(text=text, lang=lang_code).write_to_fp(buf); buf.seek(0); return buf.read()
+        return tts_bytes_cached(text, lang_code)
     except Exception:
         traceback.print_exc(); return None
 
@@ -491,9 +830,18 @@ body { background: linear-gradient(180deg,#f6fff6,#f0fff3); }
 st.markdown(RESPONSIVE_CSS, unsafe_allow_html=True)
 
 # ---------------- SIDEBAR (unified for desktop & mobile) ----------------
+# Independent external fetches run concurrently; each is read back as its section renders.
+# wttr.in geolocates by IP on its own, so weather doesn't wait on the ipinfo lookup.
+mandi_prefetch = st.session_state.get("sidebar_mandi", DEFAULT_MANDI_CROPS[0])
+sidebar_ex = ctx_executor(3)
+f_loc = sidebar_ex.submit(get_location_by_ip)
+f_wx = sidebar_ex.submit(get_weather_for, "")
+f_mandi = sidebar_ex.submit(try_get_mandi_rates, mandi_prefetch)
+sidebar_ex.shutdown(wait=False)  # no `with`: its exit would block until all three finish
+
 with st.sidebar:
     st.markdown("### 🌾 Smart Farming Advisor — Controls")
-    ip_loc = get_location_by_ip()
+    ip_loc = f_loc.result()
     det_loc = ip_loc.get("city") or ip_loc.get("region") or "Unknown"
     st.write(f"📍 Detected: **{det_loc}**")
 
@@ -511,7 +859,7 @@ with st.sidebar:
     st.markdown("### 🌦 Weather")
     st.session_state.manual_weather["location"] = st.text_input("Place (optional)", value=st.session_state.manual_weather.get("location",""))
     st.session_state.manual_weather["note"] = st.text_input("Weather note (e.g., 34°C clear)", value=st.session_state.manual_weather.get("note",""))
-    weather_auto = get_weather_for(ip_loc.get("city") or "")
+    weather_auto = f_wx.result()
     if weather_auto:
         st.info(f"Auto: {weather_auto.get('temp_c')} °C — {weather_auto.get('desc')}")
     else:
@@ -519,7 +867,7 @@ with st.sidebar:
     st.markdown("---")
     st.markdown("### 💱 Mandi (demo)")
     mandi_choice = st.selectbox("Crop", DEFAULT_MANDI_CROPS, key="sidebar_mandi")
-    mandi_rates = try_get_mandi_rates(mandi_choice)
+    mandi_rates = f_mandi.result() if mandi_choice == mandi_prefetch else try_get_mandi_rates(mandi_choice)
     if mandi_rates:
         for m,p in list(mandi_rates.items())[:6]:
             st.write(f"• {m} — {p}")
@@ -528,7 +876,7 @@ with st.sidebar:
     st.markdown("---")
     st.markdown("### 🕓 Recent reports")
     if st.session_state.history:
-        for h in st.session_state.history[:6]:
+        for h in itertools.islice(st.session_state.history, 6):
             st.markdown(f"- {h['time']} — {h['query'][:60]}{'...' if len(h['query'])>60 else ''}")
     else:
         st.write("No recent reports")
@@ -616,11 +964,13 @@ if st.button(gen_label):
     # Try Gemini if key present — use spinner
     if api_key:
         try:
+            model_hint = "models/text-bison-001"
+            prompt_hash = hashlib.sha256((prompt + model_hint).encode("utf-8")).hexdigest()
             with st.spinner("Generating AI answer..."):
-                raw = generate_advice_gemini(prompt, api_key=api_key, model_hint="models/text-bison-001")
+                raw = cached_gemini(prompt_hash, model_hint, prompt, api_key)
             text = raw if isinstance(raw, str) else str(raw)
             def extract_section(text, label):
-                m = re.search(rf"{label}:(.*?)(?:\n[A-Z]+:|\Z)", text, flags=re.S | re.I)
+                m = _SECTION_RES[label].search(text)
                 if m:
                     return m.group(1).strip()
                 return ""
@@ -633,64 +983,33 @@ if st.button(gen_label):
             st.session_state.setdefault("_internal_logs", []).append(f"Gemini error: {e}")
 
     # If Gemini wasn't used or outputs incomplete, build from local dynamic generator + translations
+    pending = {}
     if not used_gemini or not advice_en:
         advice_en = generate_advice_local_dynamic(query, None if crop=="--" else crop, None if soil=="--" else soil, None if stage=="--" else stage, weather_note, retrieved_texts=retrieved)
+        advice_hi = advice_en
+        advice_ta = advice_en
         if TRANSLATOR_OK:
-            try:
-                advice_hi = GoogleTranslator(source='auto', target='hi').translate(advice_en)
-            except Exception:
-                advice_hi = advice_en
-            try:
-                advice_ta = GoogleTranslator(source='auto', target='ta').translate(advice_en)
-            except Exception:
-                advice_ta = advice_en
-        else:
-            advice_hi = advice_en
-            advice_ta = advice_en
-
-    # Enforce exactly 10 numbered points per section (post-process if needed)
-    def enforce_10_points(section_text):
-        lines = []
-        for ln in re.split(r"\r?\n", section_text):
-            ln = ln.strip()
-            if re.match(r"^\d+\)", ln) or re.match(r"^\d+\.", ln):
-                # remove leading numbering
-                lines.append(re.sub(r"^\d+\W*\s*", "", ln))
-            elif ln:
-                # Accept lines that look like sentences
-                lines.append(ln)
-            if len(lines) >= 10:
-                break
-        # pad if necessary
-        while len(lines) < 10:
-            lines.append("Check local extension services for specific thresholds and timing.")
-        return "\n".join(f"{i+1}) {lines[i]}" for i in range(10))
-
-    advice_en_fmt = enforce_10_points(advice_en)
-    advice_hi_fmt = enforce_10_points(advice_hi)
-    advice_ta_fmt = enforce_10_points(advice_ta)
+            # both start now; only the displayed language is awaited before rendering
+            pending = translate_async(advice_en, ("hi", "ta"))
+
+    sections = {"en": advice_en, "hi": advice_hi, "ta": advice_ta}
+    if ui_lang in pending:
+        sections[ui_lang] = pending.pop(ui_lang).result()
+    sel_text = enforce_10_points(sections[ui_lang])
 
     # display only in selected UI language
     if ui_lang == "en":
         st.subheader("Advice (English)")
-        st.code(advice_en_fmt)
     elif ui_lang == "hi":
         st.subheader("सलाह (हिन्दी)")
-        st.code(advice_hi_fmt)
     else:
         st.subheader("உதவி (தமிழ்)")
-        st.code(advice_ta_fmt)
-
-    # save history (trilingual)
-    ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    st.session_state.history.insert(0, {"time": ts, "query": query, "en": advice_en_fmt, "hi": advice_hi_fmt, "ta": advice_ta_fmt})
-    st.session_state.history = st.session_state.history[:HISTORY_LIMIT]
+    st.code(sel_text)
 
     # TTS
     if GTTS_OK:
         try:
             lang_map = {"en":"en", "hi":"hi", "ta":"ta"}
-            sel_text = advice_en_fmt if ui_lang=="en" else (advice_hi_fmt if ui_lang=="hi" else advice_ta_fmt)
             tts_bytes = make_tts_bytes_safe(sel_text, lang_map.get(ui_lang, "en"))
             if tts_bytes:
                 st.audio(tts_bytes, format="audio/mp3")
@@ -701,12 +1020,26 @@ if st.button(gen_label):
     else:
         st.info("Voice output not available (install gTTS).")
 
+    # the other translation has kept running in the background; history and PDF need all three
+    for lang, fut in pending.items():
+        sections[lang] = fut.result()
+    advice_en_fmt = sel_text if ui_lang == "en" else enforce_10_points(sections["en"])
+    advice_hi_fmt = sel_text if ui_lang == "hi" else enforce_10_points(sections["hi"])
+    advice_ta_fmt = sel_text if ui_lang == "ta" else enforce_10_points(sections["ta"])
+
+    # save history (trilingual)
+    now = datetime.datetime.now()  # one timestamp for history, the PDF date and its file name
+    ts = now.strftime("%Y-%m-%d %H:%M:%S")
+    st.session_state.history.appendleft({"time": ts, "query": query, "en": advice_en_fmt, "hi": advice_hi_fmt, "ta": advice_ta_fmt})
+
     # PDF download (trilingual)
-    meta = {"location": det_loc}
-    pdf_bytes = create_trilingual_pdf_bytes(advice_en_fmt, advice_hi_fmt, advice_ta_fmt, metadata=meta)
+    try:
+        pdf_bytes = pdf_bytes_cached(advice_en_fmt, advice_hi_fmt, advice_ta_fmt, det_loc, ts)
+    except Exception:
+        pdf_bytes = None
     if pdf_bytes:
         st.download_button("📄 Download Trilingual PDF", data=pdf_bytes,
-                           file_name=f"SmartFarmingAdvice_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
+                           file_name=f"SmartFarmingAdvice_{now.strftime('%Y%m%d_%H%M%S')}.pdf",
                            mime="application/pdf")
     else:
         st.info("PDF generation not available (install reportlab or fpdf).")
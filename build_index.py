@@ -1,45 +1,139 @@
 # build_index.py
 import os
+os.environ.setdefault("OMP_WAIT_POLICY", "PASSIVE")  # must precede faiss (libgomp) import
 import pandas as pd
 import numpy as np
 import faiss
 import pickle
 from sentence_transformers import SentenceTransformer
-from sklearn.preprocessing import normalize
 
 DATA_PATH = "data/farmer_advisor_dataset.csv"
 MODEL_NAME = "all-MiniLM-L6-v2"  # small and effective; adjust if desired
+# int8 (AVX-512 VNNI) ONNX export shipped in the model repo; same file app.py encodes queries with
+ONNX_FILE = "onnx/model_qint8_avx512_vnni.onnx"
 OUT_DIR = "models"
+NUM_THREADS = os.cpu_count() or 1
+ENCODE_CHUNK = 512  # rows per encode() call; bounds peak memory to one chunk of intermediates
+# Index layout: "ivfpq" (falls back to "sq8" on small corpora), "sq8" (int8), "sqfp16" (half precision),
+# "hnsw" (graph, no training), "ivfflat" (inverted lists over exact vectors) or "pq" (exhaustive scan over PQ codes)
+INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "ivfpq")
+# IVFPQ settings: 1024 inverted lists, 32 sub-quantizers x 8 bits (32 bytes per vector)
+IVF_NLIST = 1024
+PQ_M = 32
+PQ_NBITS = 8
+IVF_NPROBE = 8
+# HNSW settings: 32 graph neighbours per node, wide beam at build time
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
 os.makedirs(OUT_DIR, exist_ok=True)
 
+def read_csv_fast(path, usecols=None):
+    """Multi-threaded pyarrow parser when available, else pandas' C engine."""
+    try:
+        return pd.read_csv(path, engine="pyarrow", usecols=usecols)
+    except (ImportError, ValueError):
+        return pd.read_csv(path, usecols=usecols)
+
 def load_dataset(path):
-    df = pd.read_csv(path)
     # Expected: a column 'question' or 'text' and 'answer' or 'advice'
+    header = pd.read_csv(path, nrows=0).columns
+    if 'question' in header or 'text' in header:
+        df = read_csv_fast(path, usecols=[c for c in header if c in ('question', 'text', 'answer')])
+    else:
+        df = read_csv_fast(path)
     if 'question' in df.columns:
         texts = df['question'].astype(str).tolist()
     elif 'text' in df.columns:
         texts = df['text'].astype(str).tolist()
     else:
-        # fallback: join all columns
-        texts = df.astype(str).agg(' '.join, axis=1).tolist()
+        # fallback: join all columns (column-wise string concat instead of a per-row Python join)
+        cols = [df[c].astype(str) for c in df.columns]
+        joined = cols[0]
+        for col in cols[1:]:
+            joined = joined + ' ' + col
+        texts = joined.tolist()
     # keep answers
     answers = df['answer'].astype(str).tolist() if 'answer' in df.columns else [""] * len(df)
     return texts, answers, df
 
+def load_model():
+    """int8 ONNX Runtime backend when the onnx extras are installed, else the PyTorch model."""
+    try:
+        return SentenceTransformer(MODEL_NAME, backend="onnx", model_kwargs={"file_name": ONNX_FILE})
+    except Exception as e:
+        print(f"ONNX backend unavailable ({e}); using PyTorch.")
+        return SentenceTransformer(MODEL_NAME)
+
+def build_faiss_index(embeddings, index_type=INDEX_TYPE):
+    """Inner-product index over L2-normalized embeddings (inner product == cosine).
+    Small corpora cannot train the IVFPQ coarse quantizer / PQ codebooks, so they get an 8-bit
+    scalar-quantized flat index instead (4x smaller than fp32, no k-means training).
+    Queries stay float32 at the search API either way; FAISS decodes the stored codes."""
+    n, d = embeddings.shape
+    if index_type == "sqfp16":
+        index = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+        index.train(embeddings)
+        index.add(embeddings)
+        return index
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(d, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.add(embeddings)
+        return index
+    if index_type == "pq" and n >= 2 ** PQ_NBITS and d % PQ_M == 0:
+        # no coarse quantizer: every query scans all codes, but 32 bytes/vector instead of 1536
+        index = faiss.IndexPQ(d, PQ_M, PQ_NBITS, faiss.METRIC_INNER_PRODUCT)
+        index.train(embeddings)
+        index.add(embeddings)
+        return index
+    # k-means wants ~39 points per centroid; each PQ codebook needs 2**nbits points
+    nlist = min(IVF_NLIST, n // 39)
+    if index_type == "ivfflat" and nlist >= 1:
+        nlist = min(nlist, int(4 * np.sqrt(n)))
+        quantizer = faiss.IndexFlatIP(d)
+        index = faiss.IndexIVFFlat(quantizer, d, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(embeddings)
+        index.add(embeddings)
+        index.nprobe = IVF_NPROBE
+        return index
+    if index_type != "ivfpq" or nlist < 1 or n < 2 ** PQ_NBITS or d % PQ_M:
+        if index_type in ("ivfpq", "ivfflat", "pq"):
+            print(f"Corpus too small for {index_type.upper()} ({n} rows); using SQ8 inner-product index.")
+        index = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+        index.train(embeddings)
+        index.add(embeddings)
+        return index
+    quantizer = faiss.IndexFlatIP(d)
+    index = faiss.IndexIVFPQ(quantizer, d, nlist, PQ_M, PQ_NBITS, faiss.METRIC_INNER_PRODUCT)
+    index.train(embeddings)
+    index.add(embeddings)
+    index.nprobe = IVF_NPROBE
+    return index
+
 def main():
+    faiss.omp_set_num_threads(NUM_THREADS)
+    try:
+        import torch
+        torch.set_num_threads(NUM_THREADS)
+    except ImportError:
+        pass
     print("Loading dataset...")
     texts, answers, df = load_dataset(DATA_PATH)
     print(f"{len(texts)} rows loaded.")
     print("Loading embedding model...")
-    model = SentenceTransformer(MODEL_NAME)
-    batch_size = 64
-    embeddings = model.encode(texts, batch_size=batch_size, show_progress_bar=True, convert_to_numpy=True)
-    # L2 normalize (helps cosine via inner product)
-    faiss.normalize_L2(embeddings)
-    d = embeddings.shape[1]
+    model = load_model()
+    batch_size = 128  # length-sorted batches waste little on padding, so larger batches pay off
+    # smart batching: encode shortest-first so each batch pads to similar lengths, then restore row order
+    order = np.argsort([len(t) for t in texts], kind="stable")
+    # stream chunks straight into one preallocated float32 buffer; normalize_embeddings=True gives
+    # unit vectors (cosine via inner product) without a separate normalize pass
+    embeddings = np.empty((len(texts), model.get_sentence_embedding_dimension()), dtype=np.float32)
+    for start in range(0, len(texts), ENCODE_CHUNK):
+        rows = order[start:start + ENCODE_CHUNK]
+        embeddings[rows] = model.encode([texts[i] for i in rows], batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+        print(f"Encoded {min(start + ENCODE_CHUNK, len(texts))}/{len(texts)}")
     print("Building FAISS index...")
-    index = faiss.IndexFlatIP(d)  # using inner product on normalized vectors == cosine similarity
-    index.add(embeddings)
+    index = build_faiss_index(embeddings)
     # Save index and metadata
     faiss.write_index(index, os.path.join(OUT_DIR, "faiss_index.bin"))
     meta = {
@@ -48,8 +142,16 @@ def main():
         "df_columns": df.columns.tolist()
     }
     with open(os.path.join(OUT_DIR, "meta.pkl"), "wb") as f:
-        pickle.dump(meta, f)
+        pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL)  # protocol 5: faster load than the default
+    # UTF-8 blob + int64 row offsets: both memory-mappable by the app, and no padding to the longest row
+    encoded = [t.encode("utf-8") for t in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    with open(os.path.join(OUT_DIR, "texts.bin"), "wb") as f:
+        f.write(b"".join(encoded))
+    np.save(os.path.join(OUT_DIR, "texts_offsets.npy"), offsets)
     print("Index and metadata saved to", OUT_DIR)
+    print("Copy faiss_index.bin, texts.bin and texts_offsets.npy next to app.py to enable retrieval in the app.")
 
 if __name__ == "__main__":
     main()